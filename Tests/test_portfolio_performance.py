@@ -1,18 +1,62 @@
 # encoding: utf-8
 import unittest
 import os
-import fileinput
+import shutil
+import tempfile
+import functools
+from unittest import mock
+from pathlib import Path
+import numpy as np
 import pandas as pd
+import portfolio_performance
 from portfolio_performance import PortfolioPerformanceData
+try:
+    from numba import njit
+except ImportError:
+    def njit(*args, **kwargs):
+        """Without numba the reference kernels run as plain Python"""
+
+        return lambda func: func
+
+
+@njit(cache=True, error_model='numpy')
+def _ref_pct_change(values):
+    """This is auxiliary function:
+    Y[t] = (X[t] - X[t-1]) / X[t-1], Y[0] = NaN"""
+
+    result = np.empty_like(values)
+    result[0] = np.nan
+    for index in range(1, len(values)):
+        result[index] = (values[index] - values[index-1]) / values[index-1]
+    return result
+
+
+@njit(cache=True, error_model='numpy')
+def _ref_cumprod_last(values):
+    """This is auxiliary function: last value of Y[t] = Y[t-1]*(X[t]+1)"""
+
+    result = 1.0
+    for value in values:
+        result *= value + 1.0
+    return result
+
+
+@functools.lru_cache(maxsize=None)
+def _load_portfolio(data_path):
+    """This is auxiliary function: parse the data files once
+    per test run and share the portfolio between read-only tests"""
+
+    return PortfolioPerformanceData(data_path)
 
 
 class TestDate(unittest.TestCase):
-    def setUp(self):
-        self.portfolio = PortfolioPerformanceData('../Data')
-        self.main_functions = (self.portfolio.calculate_asset_performance,
-                               self.portfolio.calculate_currency_performance,
-                               self.portfolio.calculate_total_performance
-                               )
+    @classmethod
+    def setUpClass(cls):
+        cls.portfolio = _load_portfolio('../Data')
+        cls.main_functions = (cls.portfolio.calculate_asset_performance,
+                              cls.portfolio.calculate_currency_performance,
+                              cls.portfolio.calculate_total_performance
+                              )
 
     def _get_normal_date(self, args):
         """All options in this method are suitable for
@@ -24,31 +68,22 @@ class TestDate(unittest.TestCase):
         self.assertIsNotNone(func3(r"2013-/\-02~@-\/-@~01",
                                    pd.to_datetime('2019-01-20')))
 
-    def test_asset_normal_date(self):
-        self._get_normal_date(
-            (self.main_functions[0],)*3)
-
-    def test_currency_normal_date(self):
-        self._get_normal_date(
-            (self.main_functions[1],)*3)
-
-    def test_total_normal_date(self):
-        self._get_normal_date(
-            (self.main_functions[2],)*3)
-
-    def test_all_in_normal_date(self):
+    def test_normal_dates(self):
+        for func in self.main_functions:
+            with self.subTest(func=func.__name__):
+                self._get_normal_date((func,)*3)
         self._get_normal_date(self.main_functions)
 
     def test_bad_date(self):
         """If the date parameter task is incorrect,
         class methods shouldn't run at all."""
 
-        for func in self.main_functions:
-            with self.assertRaises(TypeError):
-                func(20130201, 201901200)
-                func('20130201', '201901200')
-                func(2013020, 20190120)
-                func('2013020', '20190120')
+        for args in ((20130201, 201901200), ('20130201', '201901200'),
+                     (2013020, 20190120), ('2013020', '20190120')):
+            for func in self.main_functions:
+                with self.subTest(func=func, args=args), \
+                        self.assertRaises(TypeError):
+                    func(*args)
 
     def test_empty_dates(self):
         """If start_date>end_date results must be empty"""
@@ -56,6 +91,18 @@ class TestDate(unittest.TestCase):
         for func in self.main_functions:
             self.assertFalse(func(20190120, 20130201).size)
 
+    def test_result_is_independent(self):
+        """Changing a returned result must not change the next one"""
+
+        for func in self.main_functions:
+            with self.subTest(func=func.__name__):
+                expected = func(20130201, 20190120).copy()
+                result = func(20130201, 20190120)
+                result.iloc[100] = -999
+                result *= 0
+                pd.testing.assert_series_equal(func(20130201, 20190120),
+                                               expected)
+
 
 class TestInputData(unittest.TestCase):
     def setUp(self):
@@ -85,6 +132,18 @@ class TestInputData(unittest.TestCase):
             self.assertIsNone(frame) if bool_value \
                 else self.assertIsNotNone(frame)
 
+    def _get_portfolio_without(self, file_name):
+        """This is auxiliary method: build a portfolio as if one
+        of the files is missing, the data folder is not touched"""
+
+        exists = os.path.exists
+
+        def fake_exists(path):
+            return os.path.basename(path) != file_name and exists(path)
+
+        with mock.patch('portfolio_performance.os.path.exists', fake_exists):
+            return PortfolioPerformanceData(self.data_path)
+
     def test_bad_name_prices(self):
         """No found the prices.csv:
         calculate_asset_performance -> None
@@ -92,14 +151,8 @@ class TestInputData(unittest.TestCase):
         calculate_total_performance -> None
         """
 
-        file = os.path.join(self.data_path, 'prices.csv')
-        file_new = os.path.join(self.data_path, 'it_is_not_prices.csv')
-        os.rename(file, file_new)
-        portfolio = PortfolioPerformanceData(self.data_path)
-        try:
-            self._test_None_data(portfolio, (True, False, True))
-        finally:
-            os.rename(file_new, file)
+        portfolio = self._get_portfolio_without('prices.csv')
+        self._test_None_data(portfolio, (True, False, True))
 
     def test_bad_name_currencies(self):
         """No found the currencies.csv:
@@ -108,14 +161,8 @@ class TestInputData(unittest.TestCase):
         calculate_total_performance -> None
         """
 
-        file = os.path.join(self.data_path, 'currencies.csv')
-        file_new = os.path.join(self.data_path, 'it_is_not_currencies.csv')
-        os.rename(file, file_new)
-        portfolio = PortfolioPerformanceData(self.data_path)
-        try:
-            self._test_None_data(portfolio, (False, True, True))
-        finally:
-            os.rename(file_new, file)
+        portfolio = self._get_portfolio_without('currencies.csv')
+        self._test_None_data(portfolio, (False, True, True))
 
     def test_bad_name_exchanges(self):
         """No found the exchanges.csv:
@@ -124,14 +171,8 @@ class TestInputData(unittest.TestCase):
         calculate_total_performance -> None
         """
 
-        file = os.path.join(self.data_path, 'exchanges.csv')
-        file_new = os.path.join(self.data_path, 'it_is_not_exchanges.csv')
-        os.rename(file, file_new)
-        portfolio = PortfolioPerformanceData(self.data_path)
-        try:
-            self._test_None_data(portfolio, (False, True, True))
-        finally:
-            os.rename(file_new, file)
+        portfolio = self._get_portfolio_without('exchanges.csv')
+        self._test_None_data(portfolio, (False, True, True))
 
     def test_bad_name_weights(self):
         """No found the weights.csv:
@@ -140,243 +181,273 @@ class TestInputData(unittest.TestCase):
         calculate_total_performance -> None
         """
 
-        file = os.path.join(self.data_path, 'weights.csv')
-        file_new = os.path.join(self.data_path, 'it_is_not_weights.csv')
-        os.rename(file, file_new)
-        portfolio = PortfolioPerformanceData(self.data_path)
-        try:
-            self._test_None_data(portfolio, (True, True, True))
-        finally:
-            os.rename(file_new, file)
+        portfolio = self._get_portfolio_without('weights.csv')
+        self._test_None_data(portfolio, (True, True, True))
 
     @staticmethod
     def _change_file(file):
         """This is auxiliary method to corrupt data in a file."""
 
-        with fileinput.FileInput(file, inplace=True, backup='.bak') as f:
-            for index, line in enumerate(f):
-                if index == 13:
-                    print(line.replace(line, line[15:]), end='')
-                else:
-                    print(line.replace(line, line), end='')
+        data = Path(file).read_bytes()
+        Path(file + '.bak').write_bytes(data)
+        lines = data.split(b'\n')
+        lines[13] = lines[13][15:]
+        Path(file).write_bytes(b'\n'.join(lines))
+
+    def _copy_data_with(self, data_path, file_name, change):
+        """This is auxiliary method: copy the data folder into data_path
+        and rewrite file_name there, the real data is not touched"""
+
+        for name in os.listdir(self.data_path):
+            shutil.copy(os.path.join(self.data_path, name), data_path)
+        file = Path(data_path, file_name)
+        file.write_bytes(change(file.read_bytes()))
+
+    @staticmethod
+    def _blank_date(data):
+        """This is auxiliary method to remove a date from file data."""
+
+        lines = data.split(b'\n')
+        lines[13] = lines[13][lines[13].index(b','):]
+        return b'\n'.join(lines)
+
+    @staticmethod
+    def _empty_file(data):
+        """This is auxiliary method to leave only the header in file data."""
+
+        return data.split(b'\n', 1)[0] + b'\n'
 
     @staticmethod
     def _restore_file(file):
         """This is auxiliary method to restore an original file."""
 
-        os.remove(file)
-        os.rename(file + '.bak', file)
+        Path(file + '.bak').replace(file)
 
-    def test_corrupted_index_prices(self):
-        """Corrupted index in the prices.csv:
-        calculate_asset_performance -> None
-        calculate_currency_performance -> res
-        calculate_total_performance -> None
+    def test_corrupted_index(self):
+        """Corrupted index in the file:
+        prices.csv -> None, res, None
+        exchanges.csv -> res, None, None
+        weights.csv -> None, None, None
+        (calculate_asset_performance, calculate_currency_performance,
+        calculate_total_performance)
         """
 
-        file = os.path.join(self.data_path, 'prices.csv')
-        try:
-            self._change_file(file)
-            portfolio = PortfolioPerformanceData(self.data_path, silent=True)
-            self._test_None_data(portfolio, (True, False, True))
-        finally:
-            self._restore_file(file)
-
-    def test_corrupted_index_exchanges(self):
-        """Corrupted index in the exchanges.csv:
-        calculate_asset_performance -> res
-        calculate_currency_performance -> None
-        calculate_total_performance -> None
+        for file_name, bool_status in (
+                ('prices.csv', (True, False, True)),
+                ('exchanges.csv', (False, True, True)),
+                ('weights.csv', (True, True, True))):
+            with self.subTest(file=file_name):
+                file = os.path.join(self.data_path, file_name)
+                try:
+                    self._change_file(file)
+                    portfolio = PortfolioPerformanceData(self.data_path,
+                                                         silent=True)
+                    self._test_None_data(portfolio, bool_status)
+                finally:
+                    self._restore_file(file)
+
+    def test_blank_date(self):
+        """Blank date cell in the prices.csv:
+        all methods -> res, the row without a date is dropped
         """
 
-        file = os.path.join(self.data_path, 'exchanges.csv')
-        try:
-            self._change_file(file)
-            portfolio = PortfolioPerformanceData(self.data_path, silent=True)
-            self._test_None_data(portfolio, (False, True, True))
-        finally:
-            self._restore_file(file)
+        with tempfile.TemporaryDirectory() as data_path:
+            self._copy_data_with(data_path, 'prices.csv', self._blank_date)
+            portfolio = PortfolioPerformanceData(data_path)
+        self._test_None_data(portfolio, (False, False, False))
+        self.assertFalse(portfolio._df_raw['prices'].index.hasnans)
 
-    def test_corrupted_index_weights(self):
-        """Corrupted index in the weights.csv:
-        calculate_asset_performance -> None
-        calculate_currency_performance -> None
-        calculate_total_performance -> None
+    def test_empty_file(self):
+        """Only the header in the exchanges.csv:
+        all methods -> res, the range comes from the other tables
         """
 
-        file = os.path.join(self.data_path, 'weights.csv')
-        try:
-            self._change_file(file)
-            portfolio = PortfolioPerformanceData(self.data_path, silent=True)
-            self._test_None_data(portfolio, (True, True, True))
-        finally:
-            self._restore_file(file)
+        with tempfile.TemporaryDirectory() as data_path:
+            self._copy_data_with(data_path, 'exchanges.csv',
+                                 self._empty_file)
+            portfolio = PortfolioPerformanceData(data_path)
+        self._test_None_data(portfolio, (False, False, False))
 
 
 class TestAlgorithms(unittest.TestCase):
-    def setUp(self):
-        self.portfolio = PortfolioPerformanceData('../Data')
-        self.prices = self.portfolio._FormalData__df_raw_dict['prices']
-        self.weights = self.portfolio._FormalData__df_raw_dict['weights']
-        self.weights = self.weights[self.prices.columns]
-        self.currency = self.portfolio._FormalData__get_currency_raw
-        self.currency = self.currency[self.prices.columns]
-        self.test_column_number = 0
-        self.left_boarder = 0
-        self.right_boarder = 10
-        self.test_row_number = 10
-        self.boarder = (20130201, 20190120)
+    @classmethod
+    def setUpClass(cls):
+        cls.portfolio = _load_portfolio('../Data')
+        cls.portfolio._generate_asset()
+        cls.portfolio._generate_currency()
+        cls.portfolio._generate_total()
+        cls.asset_portfolio = cls.portfolio._get_asset_portfolio
+        cls.currency_portfolio = cls.portfolio._get_currency_portfolio
+        cls.total_portfolio = cls.portfolio._get_total_portfolio
+        cls.prices = cls.portfolio._FormalData__df_raw_dict['prices']
+        weights = cls.portfolio._FormalData__df_raw_dict['weights']
+        cls.weights_np = weights[cls.prices.columns].to_numpy(np.float64)
+        cls.currency = cls.portfolio._currency_raw
+        cls.currency = cls.currency[cls.prices.columns]
+        cls.test_column_number = 0
+        cls.left_boarder = 0
+        cls.right_boarder = 10
+        cls.test_row_number = 10
+        cls.boarder = (20130201, 20190120)
+        cls.asset_performance = cls.portfolio.calculate_asset_performance(
+            *cls.boarder)
+        cls.currency_performance = \
+            cls.portfolio.calculate_currency_performance(*cls.boarder)
+        cls.total_performance = cls.portfolio.calculate_total_performance(
+            *cls.boarder)
 
     def _manual_calculate_formal(self, df_column):
         """This is auxiliary method:
         Y[i,t] = (X[i,t] - X[i,t-1]) / X[i,t-1]"""
 
-        if type(df_column) != list:
-            raw_column = self._convert_df_to_list(df_column)
-        else:
-            raw_column = df_column
-        for index, value in enumerate(raw_column):
-            if not self.left_boarder and index == self.left_boarder:
-                yield float('NaN')
-                continue
-            yield(value-raw_column[index-1])/raw_column[index-1]
-
-    def _convert_df_to_list(self, df):
+        values = np.asarray(
+            df_column if np.ndim(df_column) == 1
+            else self._convert_df_to_array(df_column), dtype=np.float64)
+        return _ref_pct_change(values)
+
+    def _convert_df_to_array(self, df):
         """This is auxiliary method:
-        get column from df and convert it to list"""
+        get column from df and convert it to float ndarray"""
 
         return df.iloc[
                       self.left_boarder:self.right_boarder,
-                      self.test_column_number].to_list()
-
-    @staticmethod
-    def _clear_column(column):
-        """This is auxiliary method: drop NaNs from list"""
-
-        return [i for i in column if str(i) != 'nan']
+                      self.test_column_number].to_numpy(dtype=np.float64,
+                                                        copy=False)
 
     def test_Rit(self):
         """Compares the value obtained in the class and calculated
         here with primitive types: R[i,t]"""
 
-        manual_calculated = list(self._manual_calculate_formal(self.prices))
+        manual_calculated = self._manual_calculate_formal(self.prices)
 
-        self.portfolio._generate_asset()
-        test_column = self._convert_df_to_list(self.portfolio._df_asset)
+        test_column = self._convert_df_to_array(self.portfolio._df_asset)
 
-        self.assertAlmostEqual(self._clear_column(manual_calculated),
-                               self._clear_column(test_column))
+        np.testing.assert_allclose(manual_calculated, test_column,
+                                   rtol=1e-7, equal_nan=True)
 
     def test_CRit(self):
         """Compares the value obtained in the class and calculated
         here with primitive types: CR[i,t]"""
 
-        manual_calculated = list(self._manual_calculate_formal(self.currency))
+        manual_calculated = self._manual_calculate_formal(self.currency)
 
-        self.portfolio._generate_currency()
-        test_column = self._convert_df_to_list(self.portfolio._df_currency)
-        self.assertAlmostEqual(self._clear_column(manual_calculated),
-                               self._clear_column(test_column))
+        test_column = self._convert_df_to_array(self.portfolio._df_currency)
+        np.testing.assert_allclose(manual_calculated, test_column,
+                                   rtol=1e-7, equal_nan=True)
 
     @staticmethod
     def list_multiplication(list1, list2):
         """This is auxiliary method: LISTxLIST by elements"""
-        return [p*c for p, c in zip(list1, list2)]
+        return np.multiply(np.asarray(list1), np.asarray(list2))
 
     def test_TRit(self):
         """Compares the value obtained in the class and calculated
         here with primitive types: TR[i,t]"""
 
-        prices = self._convert_df_to_list(self.prices)
-        currency = self._convert_df_to_list(self.currency)
+        prices = self._convert_df_to_array(self.prices)
+        currency = self._convert_df_to_array(self.currency)
 
         manual_total = self.list_multiplication(prices, currency)
-        manual_calculated = list(self._manual_calculate_formal(manual_total))
+        manual_calculated = self._manual_calculate_formal(manual_total)
 
-        self.portfolio._generate_total()
-        test_column = self._convert_df_to_list(self.portfolio._df_total)
+        test_column = self._convert_df_to_array(self.portfolio._df_total)
 
-        self.assertAlmostEqual(self._clear_column(manual_calculated),
-                               self._clear_column(test_column))
+        np.testing.assert_allclose(manual_calculated, test_column,
+                                   rtol=1e-7, equal_nan=True)
 
     def test_Rt(self):
         """Compares the value obtained in the class and calculated
         here with primitive types: R[t]"""
 
-        test_value = self.portfolio._get_asset_portfolio[self.test_row_number]
+        test_value = self.asset_portfolio.iloc[self.test_row_number]
 
         test_prices = self.portfolio._df_asset.iloc(axis=0)[
             self.test_row_number].values
-        test_weights = self.weights.iloc(axis=0)[
-            self.test_row_number].values
-        calculated_value = sum(self.list_multiplication(test_prices,
-                                                        test_weights))
+        test_weights = self.weights_np[self.test_row_number]
+        calculated_value = float(np.dot(
+            np.asarray(test_prices, dtype=np.float64),
+            np.asarray(test_weights, dtype=np.float64)))
         self.assertAlmostEqual(test_value, calculated_value)
 
     def test_CRt(self):
         """Compares the value obtained in the class and calculated
         here with primitive types: CR[t]"""
 
-        test_value = self.portfolio._get_currency_portfolio[
-            self.test_row_number]
+        test_value = self.currency_portfolio.iloc[self.test_row_number]
 
         test_currency = self.portfolio._df_currency[
             self.prices.columns].iloc(axis=0)[self.test_row_number].values
-        test_weights = self.weights.iloc(axis=0)[
-            self.test_row_number].values
-        calculated_value = sum(self.list_multiplication(test_currency,
-                                                        test_weights))
+        test_weights = self.weights_np[self.test_row_number]
+        calculated_value = float(np.dot(
+            np.asarray(test_currency, dtype=np.float64),
+            np.asarray(test_weights, dtype=np.float64)))
         self.assertAlmostEqual(test_value, calculated_value)
 
     def test_TRt(self):
         """Compares the value obtained in the class and calculated
         here with primitive types: TR[t]"""
 
-        test_value = self.portfolio._get_total_portfolio[
-            self.test_row_number]
+        test_value = self.total_portfolio.iloc[self.test_row_number]
 
         test_total = self.portfolio._df_total.iloc(axis=0)[
             self.test_row_number].values
-        test_weights = self.weights.iloc(axis=0)[
-            self.test_row_number].values
-        calculated_value = sum(self.list_multiplication(test_total,
-                                                        test_weights))
+        test_weights = self.weights_np[self.test_row_number]
+        calculated_value = float(np.dot(
+            np.asarray(test_total, dtype=np.float64),
+            np.asarray(test_weights, dtype=np.float64)))
         self.assertAlmostEqual(test_value, calculated_value)
 
     def manual_cumprod(self, series):
         """This is auxiliary method: Y[t] = Y[t-1]*(X[t]+1)"""
-        values = self._clear_column(series[0: self.test_row_number+1].values)
-        results = [1]
-        for index, value in enumerate(values):
-            results.append(results[index]*(value+1))
-        return results[-1]
+        values = np.asarray(
+            series.iloc[0:self.test_row_number+1].dropna().values,
+            dtype=np.float64)
+        return _ref_cumprod_last(values)
 
     def test_Pt(self):
         """Compares the value obtained in the class and calculated
         here with primitive types: P[t]"""
 
-        test_value = self.portfolio.calculate_asset_performance(
-            *self.boarder)[self.test_row_number]
+        test_value = self.asset_performance.iloc[self.test_row_number]
         calculated_value = self.manual_cumprod(
-            self.portfolio._get_asset_portfolio)
+            self.asset_portfolio)
         self.assertAlmostEqual(test_value, calculated_value)
 
     def test_CPt(self):
         """Compares the value obtained in the class and calculated
         here with primitive types: CP[t]"""
 
-        test_value = self.portfolio.calculate_currency_performance(
-            *self.boarder)[self.test_row_number]
+        test_value = self.currency_performance.iloc[self.test_row_number]
         calculated_value = self.manual_cumprod(
-            self.portfolio._get_currency_portfolio)
+            self.currency_portfolio)
         self.assertAlmostEqual(test_value, calculated_value)
 
     def test_TPt(self):
         """Compares the value obtained in the class and calculated
         here with primitive types: TP[t]"""
 
-        test_value = self.portfolio.calculate_total_performance(
-            *self.boarder)[self.test_row_number]
+        test_value = self.total_performance.iloc[self.test_row_number]
         calculated_value = self.manual_cumprod(
-            self.portfolio._get_total_portfolio)
+            self.total_portfolio)
         self.assertAlmostEqual(test_value, calculated_value)
+
+    def test_performance_kernels(self):
+        """Compares the NumPy path, the loop kernel and the dispatched
+        (numba if installed) one on data with NaN rows: P[t]"""
+
+        rng = np.random.RandomState(0)
+        raw = np.asfortranarray(rng.uniform(0.5, 1.5, (50, 4)))
+        weights = np.asfortranarray(rng.uniform(0.0, 0.5, (50, 4)))
+        raw[[5, 20], 1] = np.nan
+        weights[33, 2] = np.nan
+        expected = portfolio_performance._compute_performance_vectorized(
+            raw, weights)
+        self.assertEqual(np.isnan(expected).sum(), 6)
+        with mock.patch('portfolio_performance._JIT_MIN_SIZE', 0):
+            dispatched = portfolio_performance._compute_performance(
+                raw, weights)
+        for result in (
+                portfolio_performance._compute_performance_loop(raw, weights),
+                dispatched):
+            np.testing.assert_allclose(result, expected, rtol=1e-12,
+                                       equal_nan=True)
@@ -4,19 +4,52 @@
 """Test task for RockSci from Vadim F."""
 
 import os
+import functools
+from concurrent.futures import ThreadPoolExecutor
 try:
     from typing import Union, Any, Callable, Dict, List, Tuple
+    import numpy as np
     import pandas as pd
 except ModuleNotFoundError as e:
     if e.name == 'typing':
         print('Types have been introduced in Python '
               'from version 3.5. Your version is outdated! Time2upd!')
-    elif e.name == 'pandas':
+    elif e.name in ('numpy', 'pandas'):
         print('Use "pip install -r requirements.txt" in the root directory')
     import sys
     sys.exit(-1)
 
 
+class _NonDigitTable(dict):
+    """Translation table for str.translate that deletes every
+    non-digit character. Entries are filled lazily on first lookup.
+    """
+
+    def __missing__(self, code: int) -> Union[int, None]:
+        self[code] = code if chr(code).isdigit() else None
+        return self[code]
+
+
+_NON_DIGIT_TABLE = _NonDigitTable()
+_DF_TYPES = (pd.DataFrame, pd.Series)
+
+
+@functools.lru_cache(maxsize=1024)
+def _parse_date_str(arg: str) -> Union[pd.core.api.Timestamp, bool]:
+    """
+    The function to convert string to date, results are memoized.
+
+    :param arg: str with 8 digits (YYYYMMDD) and any separators.
+    :return: Timestamp if successful otherwise False.
+    """
+
+    try:
+        return pd.to_datetime(arg.translate(_NON_DIGIT_TABLE),
+                              format='%Y%m%d')
+    except ValueError:
+        return False
+
+
 def try_convert_date_time(arg: Union[pd.core.api.Timestamp, str, int]) \
         -> Union[pd.core.api.Timestamp, bool]:
     """
@@ -31,16 +64,111 @@ def try_convert_date_time(arg: Union[pd.core.api.Timestamp, str, int]) \
     :return: Timestamp if successful otherwise False.
     """
 
-    if type(arg) == pd.core.api.Timestamp:
+    if isinstance(arg, pd.core.api.Timestamp):
         return arg
 
-    arg = str(arg)
-    for symbol in set(ch for ch in arg if not ch.isdigit()):
-        arg = arg.replace(symbol, '')
+    return _parse_date_str(str(arg))
+
+
+def _compute_performance_vectorized(raw: np.ndarray, weights: np.ndarray) \
+        -> np.ndarray:
+    """
+    The function calculates the portfolio performance in one pass.
+
+    Attitude, weighting, summing and cumulative product are fused
+    over ndarrays without intermediate DataFrames:
+    Y{t}=Y{t-1}(1+sum(W{i,t}*(X{i,t}/X{i,t-1}-1))) if Y{-1} = 1.
+    As in pandas cumprod, NaN rows are skipped by the product
+    and remain NaN.
+
+    :param raw: T x N prices, currencies or total (before attitude).
+    :param weights: T x N weights aligned with raw.
+    :return: T values of the performance, the first one is NaN.
+    """
+
+    portfolio = np.full(raw.shape[0], np.nan)
+    portfolio[1:] = np.einsum('tn,tn->t', raw[1:] / raw[:-1] - 1.0,
+                              weights[1:])
+    # in place: NaN rows are multiplied as 1 and restored afterwards
+    portfolio += 1.0
+    nan_mask = np.isnan(portfolio)
+    portfolio[nan_mask] = 1.0
+    np.cumprod(portfolio, out=portfolio)
+    portfolio[nan_mask] = np.nan
+    return portfolio
+
+
+def _compute_performance_loop(raw: np.ndarray, weights: np.ndarray) \
+        -> np.ndarray:
+    """
+    The function is _compute_performance_vectorized written as loops.
+
+    It is compiled with numba for large inputs: no temporary arrays.
+    Columns are walked in the outer loop, the arrays come from
+    DataFrame.to_numpy and are Fortran-ordered, so every column
+    is read sequentially.
+
+    :param raw: T x N prices, currencies or total (before attitude).
+    :param weights: T x N weights aligned with raw.
+    :return: T values of the performance, the first one is NaN.
+    """
+
+    rows, columns = raw.shape
+    portfolio = np.zeros(rows)
+    for column in range(columns):
+        for row in range(1, rows):
+            portfolio[row] += weights[row, column] * (
+                raw[row, column] / raw[row - 1, column] - 1.0)
+    performance = np.full(rows, np.nan)
+    accumulator = 1.0
+    for row in range(1, rows):
+        if not np.isnan(portfolio[row]):
+            accumulator *= 1.0 + portfolio[row]
+            performance[row] = accumulator
+    return performance
+
+
+# importing numba and loading the cached kernel takes about 0.3 s,
+# the kernel saves it back only from about 1e8 values
+_JIT_MIN_SIZE = 10 ** 8
+
+
+@functools.lru_cache(maxsize=1)
+def _get_performance_kernel() -> Union[Callable, None]:
+    """
+    The function compiles _compute_performance_loop with numba.
+
+    :return: Compiled function or None if numba is not installed.
+    """
+
     try:
-        return pd.to_datetime(arg, format='%Y%m%d')
-    except ValueError:
-        return False
+        from numba import njit
+    except ImportError:  # numba is optional, NumPy path is used without it
+        return None
+    return njit(cache=True, error_model='numpy')(_compute_performance_loop)
+
+
+def _compute_performance(raw: np.ndarray, weights: np.ndarray) \
+        -> np.ndarray:
+    """
+    The function calculates the portfolio performance.
+
+    Large Fortran-ordered inputs (as DataFrame.to_numpy returns them)
+    go to the numba kernel if numba is installed, the rest to the
+    NumPy path.
+
+    :param raw: T x N prices, currencies or total (before attitude).
+    :param weights: T x N weights aligned with raw.
+    :return: T values of the performance, the first one is NaN.
+    """
+
+    # the kernel reads columns, other layouts are slower than NumPy
+    if raw.size >= _JIT_MIN_SIZE and raw.flags.f_contiguous \
+            and weights.flags.f_contiguous:
+        kernel = _get_performance_kernel()
+        if kernel is not None:
+            return kernel(raw, weights)
+    return _compute_performance_vectorized(raw, weights)
 
 
 def date_checker(func: Callable[..., pd.Series]) -> Any:
@@ -49,23 +177,23 @@ def date_checker(func: Callable[..., pd.Series]) -> Any:
 
     It attempts to get Timestamps and call function with new
     converted arguments otherwise raise Exception.
+    The wrapper is specialized for methods with signature
+    (self, start_date, end_date).
 
     :param func: function for decorate.
     :return: result of function.
     """
 
-    def wrapper(*args, **kwargs):
-        new_arg = [args[0]]  # self in the list
-        for arg in args[1:]:
-            date = try_convert_date_time(arg)
-            if not date:
-                raise TypeError('Incorrect format of date, use:\n'
-                                '1)int - 8 digits\n'
-                                '2)str - 8+ (with/without seps) characters'
-                                ' (YYYYMMDD) with any separators')
-
-            new_arg.append(date)
-        return func(*new_arg, **kwargs)
+    @functools.wraps(func)
+    def wrapper(self, start_date, end_date, **kwargs):
+        start_date = try_convert_date_time(start_date)
+        end_date = try_convert_date_time(end_date)
+        if not start_date or not end_date:
+            raise TypeError('Incorrect format of date, use:\n'
+                            '1)int - 8 digits\n'
+                            '2)str - 8+ (with/without seps) characters'
+                            ' (YYYYMMDD) with any separators')
+        return func(self, start_date, end_date, **kwargs)
     return wrapper
 
 
@@ -74,22 +202,22 @@ def df_checker(func: Callable[..., Union[pd.DataFrame, pd.Series, None]])\
     """
     The function is decorator for check DataFrame object.
 
-    If there is no necessary argument (DataFrame) in the args of
-    function, then it will not call the function and will return None
+    If the first argument after self is not a DataFrame or Series,
+    then it will not call the function and will return None
     otherwise will call function.
 
-    :param func: function for decorate.
+    :param func: method for decorate, DataFrame goes right after self.
     :return: result of function.
     """
 
-    def wrapper(*args, **kwargs):
-        for arg in args:
-            if type(arg) in (pd.DataFrame, pd.Series):
-                try:
-                    return func(*args, **kwargs)
-                except KeyError:
-                    return None
-        return None
+    @functools.wraps(func)
+    def wrapper(self, df, *args, **kwargs):
+        if not isinstance(df, _DF_TYPES):
+            return None
+        try:
+            return func(self, df, *args, **kwargs)
+        except KeyError:
+            return None
     return wrapper
 
 
@@ -102,8 +230,10 @@ class FormalData:
         self.__df_raw_dict = {}
         self.__df_asset = None
         self.__df_currency = None
-        self.__raw_currency = None
         self.__df_total = None
+        self.__currency_raw = None
+        self.__total_raw = None
+        self.__cache_dict = {}
 
     @property
     def _df_raw(self) -> Dict:
@@ -113,6 +243,14 @@ class FormalData:
     def _df_raw(self, df_value: Dict) -> None:
         self.__df_raw_dict = df_value
 
+    @property
+    def _cache(self) -> Dict:
+        return self.__cache_dict
+
+    @_cache.setter
+    def _cache(self, cache_value: Dict) -> None:
+        self.__cache_dict = cache_value
+
     @property
     def _df_asset(self) -> Union[pd.DataFrame, None]:
         return self.__df_asset
@@ -129,14 +267,6 @@ class FormalData:
     def _df_currency(self, currency_value: pd.DataFrame) -> None:
         self.__df_currency = currency_value
 
-    @property
-    def _df_currency_raw(self) -> Union[pd.DataFrame, None]:
-        return self.__raw_currency
-
-    @_df_currency_raw.setter
-    def _df_currency_raw(self, currency_raw_value: pd.DataFrame) -> None:
-        self.__raw_currency = currency_raw_value
-
     @property
     def _df_total(self) -> Union[pd.DataFrame, None]:
         return self.__df_total
@@ -145,21 +275,44 @@ class FormalData:
     def _df_total(self, total_value: pd.DataFrame) -> None:
         self.__df_total = total_value
 
-    @staticmethod
     @df_checker
-    def __get_an_attitude(df: pd.DataFrame) -> pd.DataFrame:
+    def __get_an_attitude(self, df: pd.DataFrame) -> pd.DataFrame:
         """
         The method calculates (df[n]-df[n-1])/df[n-1].
 
         The attitude is needed to calculate R[i,t], CR[i,t], TR[i,t].
+        It is computed as df[n]/df[n-1] - 1, which is the same value
+        with one intermediate frame less.
 
         :param df: DataFrame for calculating with attitude
         (R[i,t], CR[i,t], TR[i,t]).
         :return: Calculated DateFrame.
         """
-        attitude = df.diff().div(df.shift(1))
+        attitude = df.div(df.shift(1)).sub(1)
         return attitude
 
+    @property
+    def _currency_raw(self) -> Union[pd.DataFrame, None]:
+        """
+        Exchange rates of every asset, computed once and cached.
+
+        :return: DataFrame - asset table with exchange rates or None.
+        """
+        if self.__currency_raw is None:
+            self.__currency_raw = self.__get_currency_raw
+        return self.__currency_raw
+
+    @property
+    def _total_raw(self) -> Union[pd.DataFrame, None]:
+        """
+        Prices in the common currency, computed once and cached.
+
+        :return: Total table or None.
+        """
+        if self.__total_raw is None:
+            self.__total_raw = self.__get_total_raw
+        return self.__total_raw
+
     @property
     def __get_currency_raw(self) -> Union[pd.DataFrame, None]:
         """
@@ -177,18 +330,16 @@ class FormalData:
         exchanges_df = self._df_raw.get('exchanges')
         if currency_df is None or exchanges_df is None:
             return None
-        # merge transpose exchange on currency on right key currency
-        # (like a SQL right join) with drop currency row from result
-        merge_df = exchanges_df.T.merge(
-            currency_df, how='right', right_on='currency',
-            left_index=True).T.drop('currency')
-        merge_df.index = pd.to_datetime(merge_df.index)
+        # take the exchange column of every asset currency and
+        # name it after the asset (like a SQL right join)
+        currency = currency_df['currency']
+        merge_df = exchanges_df.reindex(columns=currency.to_numpy())
+        merge_df.columns = currency.index
         # get columns with all nan to fill them with 1
         # it is assumed that this is a currency column to which other
         # or equivalent currency is converted with
         # a conversion factor of 1
-        new_columns = merge_df.columns[merge_df.isna().all()].tolist()
-        merge_df[new_columns] = merge_df[new_columns].fillna(value=1)
+        merge_df.loc[:, merge_df.isna().all(axis=0).to_numpy()] = 1.0
         return merge_df
 
     @property
@@ -203,13 +354,10 @@ class FormalData:
         :return: Total table - multiplication of the price table
         for the exchange table or None.
         """
-        if self._df_raw['prices'] is None:
+        prices, currency = self._df_raw['prices'], self._currency_raw
+        if prices is None or currency is None:
             return None
-        elif self._df_currency_raw is None:
-            self._df_currency_raw = self.__get_currency_raw
-            if self._df_currency_raw is None:
-                return None
-        return self._df_raw['prices'].mul(self._df_currency_raw)
+        return prices.mul(currency)
 
     def _get_full_range_for_dates(self) -> \
             Tuple[Union[None, pd.DatetimeIndex], List]:
@@ -219,8 +367,8 @@ class FormalData:
         If some index is corrupted, then it does not participate in
         the reindexing and the table becomes invalid
 
-        All tables with dates merged into one and a full range
-        is obtained for all dates.
+        Indexes are converted to DatetimeIndex in place if needed,
+        a full range is obtained from the min and max over all dates.
         In fact, it corresponds to the range for the exchange table
         in a specific example.
 
@@ -228,23 +376,26 @@ class FormalData:
         and list of keys with corrupted index
         """
 
-        frames, bad_frames = [], []
+        indexes, bad_frames = [], []
         for key, data in self._df_raw.items():
-            if type(data) != pd.DataFrame or data.index.name != 'dates':
+            if not isinstance(data, pd.DataFrame) or \
+                    data.index.name != 'dates':
                 continue
-            try:
-                # check corrupted index
-                pd.to_datetime(data.index)
-                frames.append(data)
-            except ValueError:
-                bad_frames.append(key)
-
-        if not frames:
+            if not isinstance(data.index, pd.DatetimeIndex):
+                try:
+                    # check corrupted index
+                    data.index = pd.DatetimeIndex(data.index, name='dates')
+                except ValueError:
+                    bad_frames.append(key)
+                    continue
+            indexes.append(data.index)
+
+        # an empty index gives NaT, which must be skipped, not compared
+        min_date = pd.DatetimeIndex([index.min() for index in indexes]).min()
+        max_date = pd.DatetimeIndex([index.max() for index in indexes]).max()
+        if pd.isna(min_date):
             return None, bad_frames
 
-        concat_frame = pd.concat(pd.Series(frames.index)
-                                 for frames in frames)
-        min_date, max_date = concat_frame.min(), concat_frame.max()
         date_index = pd.date_range(start=min_date, end=max_date)
         date_index.name = 'dates'
         return date_index, bad_frames
@@ -252,7 +403,7 @@ class FormalData:
     @staticmethod
     def _normalize_a_frame(df: pd.DataFrame) -> None:
         """
-        The method filled NaN in input DataFrame with ffillna method.
+        The method filled NaN in input DataFrame with ffill method.
 
         It's propagate last valid observation forward to next valid.
         NaN at 1st row remain NaN!
@@ -262,7 +413,7 @@ class FormalData:
         :return: Normalized DateFrame inplace.
         """
 
-        df.fillna(method='ffill', inplace=True)
+        df.ffill(inplace=True)
 
     def _generate_asset(self) -> None:
         """
@@ -280,10 +431,8 @@ class FormalData:
         Coordination method for calculate CR[i,t].
         :return: Assigns a new value to self._df_currency.
         """
-        if self._df_currency_raw is None:
-            self._df_currency_raw = self.__get_currency_raw
         if self._df_currency is None:
-            self._df_currency = self.__get_an_attitude(self._df_currency_raw)
+            self._df_currency = self.__get_an_attitude(self._currency_raw)
 
     def _generate_total(self) -> None:
         """
@@ -293,7 +442,7 @@ class FormalData:
         """
 
         if self._df_total is None:
-            self._df_total = self.__get_an_attitude(self.__get_total_raw)
+            self._df_total = self.__get_an_attitude(self._total_raw)
 
 
 class PortfolioData(FormalData):
@@ -301,6 +450,25 @@ class PortfolioData(FormalData):
     PortfolioPerformanceData. Functional class. No data is stored here
     """
 
+    @staticmethod
+    def __align_with_weights(df: pd.DataFrame, weights: pd.DataFrame) -> \
+            Tuple[np.ndarray, np.ndarray]:
+        """
+        The method aligns the table with the weights.
+
+        Columns and rows are matched the same way as DataFrame.mul
+        does it, values are returned as float64 ndarrays.
+
+        :param df: table with assets as columns and dates as rows.
+        :param weights: weights table.
+        :return: values of df and values of the weights.
+        """
+
+        columns = df.columns.union(weights.columns)
+        return (df.reindex(columns=columns).to_numpy(dtype=np.float64),
+                weights.reindex(index=df.index, columns=columns).to_numpy(
+                    dtype=np.float64))
+
     @df_checker
     def __get_a_portfolio(self, df: pd.DataFrame) -> Union[pd.DataFrame, None]:
         """
@@ -308,48 +476,126 @@ class PortfolioData(FormalData):
 
         The method for calculating the portfolio by multiplying
         the previously calculated table by the weight
-        and summing the columns
+        and summing the columns.
+        It is a single einsum without an intermediate table, NaN in any
+        column gives NaN for the date (like sum with skipna=False).
 
         :param df: R[i,t], CR[i,t] or TR[i,t].
         :return: Portfolio DataFrame
         """
 
-        if self._df_raw['weights'] is None:
+        weights = self._df_raw['weights']
+        if weights is None:
             return None
-        return df.mul(self._df_raw['weights']).sum(axis=1, skipna=False)
+        values, weights = self.__align_with_weights(df, weights)
+        return pd.Series(np.einsum('tn,tn->t', values, weights),
+                         index=df.index)
+
+    @df_checker
+    def __get_a_performance(self, df: pd.DataFrame, name: str) -> \
+            Union[pd.Series, None]:
+        """
+        The method is needed to get the portfolio performance.
+
+        The raw table is aligned with the weights the same way
+        as DataFrame.mul does it and the rest is calculated in one pass
+        by _compute_performance.
+
+        :param df: prices, currencies or total table (before attitude).
+        :param name: name of result pandas Series.
+        :return: Performance Series or None.
+        """
+
+        weights = self._df_raw['weights']
+        if weights is None:
+            return None
+        performance = _compute_performance(
+            *self.__align_with_weights(df, weights))
+        return pd.Series(performance, index=df.index, name=name)
 
     @property
     def _get_asset_portfolio(self) -> Union[pd.DataFrame, None]:
         """
         The method is a wrapper over self.__get_a_portfolio.
         Coordination method for calculate R[t].
+        The result is cached.
         :return: Calculated R[t] or None.
         """
 
-        self._generate_asset()
-        return self.__get_a_portfolio(self._df_asset)
+        if 'Rt' not in self._cache:
+            self._generate_asset()
+            self._cache['Rt'] = self.__get_a_portfolio(self._df_asset)
+        return self._cache['Rt']
 
     @property
     def _get_currency_portfolio(self) -> Union[pd.DataFrame, None]:
         """
         The method is a wrapper over self.__get_a_portfolio.
         Coordination method for calculate CR[t].
+        The result is cached.
         :return: Calculated CR[t] or None.
         """
 
-        self._generate_currency()
-        return self.__get_a_portfolio(self._df_currency)
+        if 'CRt' not in self._cache:
+            self._generate_currency()
+            self._cache['CRt'] = self.__get_a_portfolio(self._df_currency)
+        return self._cache['CRt']
 
     @property
     def _get_total_portfolio(self) -> Union[pd.DataFrame, None]:
         """
         The method is a wrapper over self.__get_a_portfolio.
         Coordination method for calculate TR[t].
+        The result is cached.
         :return: Calculated TR[t] or None.
         """
 
-        self._generate_total()
-        return self.__get_a_portfolio(self._df_total)
+        if 'TRt' not in self._cache:
+            self._generate_total()
+            self._cache['TRt'] = self.__get_a_portfolio(self._df_total)
+        return self._cache['TRt']
+
+    @property
+    def _get_asset_performance(self) -> Union[pd.Series, None]:
+        """
+        The method is a wrapper over self.__get_a_performance.
+        Coordination method for calculate P[t].
+        The result is cached.
+        :return: Calculated P[t] or None.
+        """
+
+        if 'Pt' not in self._cache:
+            self._cache['Pt'] = self.__get_a_performance(
+                self._df_raw['prices'], 'Pt')
+        return self._cache['Pt']
+
+    @property
+    def _get_currency_performance(self) -> Union[pd.Series, None]:
+        """
+        The method is a wrapper over self.__get_a_performance.
+        Coordination method for calculate CP[t].
+        The result is cached.
+        :return: Calculated CP[t] or None.
+        """
+
+        if 'CPt' not in self._cache:
+            self._cache['CPt'] = self.__get_a_performance(
+                self._currency_raw, 'CPt')
+        return self._cache['CPt']
+
+    @property
+    def _get_total_performance(self) -> Union[pd.Series, None]:
+        """
+        The method is a wrapper over self.__get_a_performance.
+        Coordination method for calculate TP[t].
+        The result is cached.
+        :return: Calculated TP[t] or None.
+        """
+
+        if 'TPt' not in self._cache:
+            self._cache['TPt'] = self.__get_a_performance(
+                self._total_raw, 'TPt')
+        return self._cache['TPt']
 
 
 class PortfolioPerformanceData(PortfolioData):
@@ -372,22 +618,24 @@ class PortfolioPerformanceData(PortfolioData):
         super().__init__()
         data_dict = {}
         keys_for_reindex = []
-        for key, row_name in zip(
-                ('currencies', 'exchanges', 'prices', 'weights'),
-                ('asset id', *('dates',) * 3)):
-            full_file_name = os.path.join(path_with_data, key + '.csv')
-            data_dict.update(
-                {key: pd.read_csv(
-                    full_file_name, parse_dates=[0],
-                    index_col=0) if os.path.exists(full_file_name) else None})
+        keys = ('currencies', 'exchanges', 'prices', 'weights')
+        row_names = ('asset id', *('dates',) * 3)
+        # read_csv releases the GIL while parsing, so files are read
+        # in parallel threads
+        with ThreadPoolExecutor(max_workers=len(keys)) as executor:
+            frames = list(executor.map(
+                self.__read_csv,
+                (os.path.join(path_with_data, key + '.csv') for key in keys),
+                (row_name == 'dates' for row_name in row_names)))
+        for key, row_name, frame in zip(keys, row_names, frames):
+            data_dict[key] = frame
             if data_dict[key] is None:
                 continue
             try:
                 data_dict[key].index.name = row_name
                 if row_name == 'dates':
                     keys_for_reindex.append(key)
-                    data_dict[key] = data_dict[key].apply(
-                        pd.to_numeric, errors='coerce')
+                    data_dict[key] = self.__to_float(data_dict[key])
             except AttributeError:
                 pass
         self._df_raw = data_dict
@@ -400,31 +648,88 @@ class PortfolioPerformanceData(PortfolioData):
                           " will not be used".format(key))
                 self._df_raw[key] = None
                 continue
-            self._df_raw[key] = self._df_raw[key].reindex(
-                general_index)
-            self._normalize_a_frame(self._df_raw[key])
+            # NaN inside the file are filled on the (smaller) raw frame,
+            # the new dates are filled by reindex itself
+            frame = self._df_raw[key]
+            # rows with a blank date cannot be placed on the range,
+            # NaT would also break the monotonic index for the ffill
+            if frame.index.hasnans:
+                frame = frame[frame.index.notna()].copy()
+            if not frame.index.is_monotonic_increasing:
+                frame = frame.sort_index()
+            self._normalize_a_frame(frame)
+            self._df_raw[key] = frame.reindex(general_index, method='ffill')
 
     @staticmethod
+    def __to_float(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        The method converts all columns of DataFrame to float64.
+
+        Already numeric frames are cast directly. Otherwise only
+        object columns are coerced with pd.to_numeric, values that
+        can't be converted become NaN.
+
+        :param df: DataFrame loaded from csv.
+        :return: float64 DataFrame.
+        """
+
+        try:
+            return df.astype(np.float64, copy=False)
+        except ValueError:
+            columns = df.select_dtypes(include='object').columns
+            df[columns] = df[columns].apply(pd.to_numeric, errors='coerce')
+            return df.astype(np.float64, copy=False)
+
+    @staticmethod
+    def __read_csv(full_file_name: str, numeric: bool) -> \
+            Union[pd.DataFrame, None]:
+        """
+        The method reads one csv file with an index in the first column.
+
+        Numeric tables are parsed straight into float64. If the file
+        has values that are not numbers, it is read as is and
+        converted by self.__to_float.
+
+        :param full_file_name: path to the csv file.
+        :param numeric: all columns except the index are numbers.
+        :return: DataFrame or None if there is no such file.
+        """
+
+        if not os.path.exists(full_file_name):
+            return None
+        dtype = None
+        if numeric:
+            columns = pd.read_csv(full_file_name, nrows=0).columns
+            dtype = {column: np.float64 for column in columns[1:]}
+        try:
+            return pd.read_csv(full_file_name, parse_dates=[0], index_col=0,
+                               dtype=dtype)
+        except ValueError:
+            return pd.read_csv(full_file_name, parse_dates=[0], index_col=0)
+
     @df_checker
-    def __portfolio_performance(df, start_date: Union[
+    def __portfolio_performance(self, df, start_date: Union[
             pd.core.api.Timestamp, str, int], end_date: Union[
-            pd.core.api.Timestamp, str, int], name: str) ->\
-            Union[pd.Series, None]:
+            pd.core.api.Timestamp, str, int]) -> Union[pd.Series, None]:
         """
         The method is needed to get the portfolio performance.
 
-        Y{t}=Y{t-1}(1+X{t}) = DF.add(1).cumprod() if Y{0} = 1.
-        In this case we can add 1 to all lines - add(1) and
-        sequentially multiply all strings to previous ones - cumprod().
+        The full performance P[t], CP[t] or TP[t] is calculated once
+        by PortfolioData, here it is only cut by dates.
+        Borders are found by binary search on the sorted dates,
+        the result is the same as df[start_date:end_date].
+        A copy is returned, so callers can't change the cached series.
 
-        :param df: R[t], CR[t] or TR[t].
+        :param df: P[t], CP[t] or TP[t].
         :param start_date: left border slice for date (including).
-        :param end_date: right border slice for date (excluding).
-        :param name: name of result pandas Series.
+        :param end_date: right border slice for date (including).
         :return: result of the calculation is taken
         on the cut of the date.
         """
-        return df.add(1).cumprod().rename(name)[start_date:end_date]
+
+        start = df.index.searchsorted(start_date, side='left')
+        end = df.index.searchsorted(end_date, side='right')
+        return df.iloc[start:end].copy()
 
     @date_checker
     def calculate_asset_performance(self, start_date: Union[
@@ -439,8 +744,8 @@ class PortfolioPerformanceData(PortfolioData):
         :return: result of self.__portfolio_performance -
         calculated pd.Series.
         """
-        return self.__portfolio_performance(self._get_asset_portfolio,
-                                            start_date, end_date, 'Pt')
+        return self.__portfolio_performance(self._get_asset_performance,
+                                            start_date, end_date)
 
     @date_checker
     def calculate_currency_performance(self, start_date: Union[
@@ -455,8 +760,8 @@ class PortfolioPerformanceData(PortfolioData):
         calculated pd.Series.
         """
 
-        return self.__portfolio_performance(self._get_currency_portfolio,
-                                            start_date, end_date, 'CPt')
+        return self.__portfolio_performance(self._get_currency_performance,
+                                            start_date, end_date)
 
     @date_checker
     def calculate_total_performance(self, start_date: Union[
@@ -471,5 +776,5 @@ class PortfolioPerformanceData(PortfolioData):
         calculated pd.Series.
         """
 
-        return self.__portfolio_performance(self._get_total_portfolio,
-                                            start_date, end_date, 'TPt')
+        return self.__portfolio_performance(self._get_total_performance,
+                                            start_date, end_date)